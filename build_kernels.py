@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Ahead-of-time build of the numba kernels used by createmap.py.
+
+Run `python build_kernels.py` once to write a compiled createmap_kernels
+extension module next to the sources. createmap.py imports it when present
+and falls back to the JIT (or plain NumPy) versions when it is not, so
+building is optional — it just removes the numba JIT warmup, which for a
+CLI run once per GPX file can cost more than the work the JIT saves.
+
+The function bodies intentionally mirror _max_haversine_jit and
+_rdp_mask_jit in createmap.py; keep them in sync when touching either.
+"""
+
+import math
+
+import numpy as np
+from numba.pycc import CC
+
+cc = CC('createmap_kernels')
+
+EARTH_RADIUS_M = 6371000.0
+
+
+@cc.export('max_haversine', 'f8(f8[:], f8[:], f8, f8)')
+def max_haversine(lats, lons, clat, clon):
+    """Largest haversine distance (meters) from (clat, clon); radians in."""
+    best = 0.0
+    for i in range(lats.shape[0]):
+        dlat = lats[i] - clat
+        dlon = lons[i] - clon
+        a = (math.sin(dlat * 0.5) ** 2
+             + math.cos(clat) * math.cos(lats[i]) * math.sin(dlon * 0.5) ** 2)
+        best = max(best, 2.0 * EARTH_RADIUS_M * math.asin(math.sqrt(a)))
+    return best
+
+
+@cc.export('rdp_simplify', 'b1[:](f8[:], f8[:], f8)')
+def rdp_simplify(x, y, epsilon):
+    """Iterative Ramer-Douglas-Peucker keep-mask for a polyline."""
+    n = x.shape[0]
+    keep = np.zeros(n, np.bool_)
+    keep[0] = True
+    keep[n - 1] = True
+    stack = np.empty((2 * n, 2), np.int64)
+    stack[0, 0] = 0
+    stack[0, 1] = n - 1
+    top = 1
+    while top > 0:
+        top -= 1
+        i0 = stack[top, 0]
+        i1 = stack[top, 1]
+        if i1 - i0 < 2:
+            continue
+        x0 = x[i0]
+        y0 = y[i0]
+        dx = x[i1] - x0
+        dy = y[i1] - y0
+        seg = (dx * dx + dy * dy) ** 0.5
+        dmax = -1.0
+        imax = i0
+        for i in range(i0 + 1, i1):
+            if seg == 0.0:
+                d = ((x[i] - x0) ** 2 + (y[i] - y0) ** 2) ** 0.5
+            else:
+                d = abs(dx * (y[i] - y0) - dy * (x[i] - x0)) / seg
+            if d > dmax:
+                dmax = d
+                imax = i
+        if dmax > epsilon:
+            keep[imax] = True
+            stack[top, 0] = i0
+            stack[top, 1] = imax
+            top += 1
+            stack[top, 0] = imax
+            stack[top, 1] = i1
+            top += 1
+    return keep
+
+
+if __name__ == '__main__':
+    cc.compile()
@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""Create pretty maps from GPX running tracks.
+
+Parses a GPX file, figures out a circle that covers the whole track, renders
+the surrounding area with prettymaps and draws the track on top.
+"""
+
+import argparse
+import array
+import math
+import os
+import random
+import xml.etree.ElementTree
+
+import gpxpy
+import gpxpy.parser
+import numpy as np
+
+# matplotlib.pyplot and prettymaps are imported lazily inside the methods
+# that use them: together they pull in around a second of transitive imports
+# (osmnx, geopandas, shapely, pyproj, ...) that --help, --track-only and
+# error paths never need.
+
+try:
+    from numba import njit, prange
+    _HAVE_NUMBA = True
+except ImportError:  # numba is optional; everything still runs, just slower
+    _HAVE_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+try:
+    # Kernels compiled ahead of time with numba.pycc (see build_kernels.py);
+    # importing them skips the JIT warmup a cold CLI run would otherwise pay.
+    from createmap_kernels import max_haversine as _max_haversine_aot
+    from createmap_kernels import rdp_simplify as _rdp_mask_aot
+except ImportError:
+    _max_haversine_aot = None
+    _rdp_mask_aot = None
+
+# gpxpy prefers lxml when it is installed, but parsing is now faster with the
+# stdlib parser, so force ElementTree regardless of what is available.
+gpxpy.parser.mod_etree = xml.etree.ElementTree
+
+# Mean Earth radius in meters, used for the haversine distance.
+EARTH_RADIUS_M = 6371000.0
+
+# Slack for floating-point comparisons in the enclosing-circle tests.
+_MEC_EPSILON = 1 + 1e-12
+
+
+@njit(cache=True, parallel=True, fastmath=True)
+def _max_haversine_jit(lats, lons, clat, clon):
+    """Largest haversine distance (meters) from (clat, clon), fused in one scan.
+
+    All inputs are in radians. Projection, trig and the running max happen
+    per element, so the coordinate arrays are streamed through once with no
+    intermediate arrays materialized.
+    """
+    best = 0.0
+    for i in prange(lats.shape[0]):
+        dlat = lats[i] - clat
+        dlon = lons[i] - clon
+        a = (math.sin(dlat * 0.5) ** 2
+             + math.cos(clat) * math.cos(lats[i]) * math.sin(dlon * 0.5) ** 2)
+        best = max(best, 2.0 * EARTH_RADIUS_M * math.asin(math.sqrt(a)))
+    return best
+
+
+def _max_haversine_np(lats, lons, clat, clon):
+    """Vectorized NumPy fallback for _max_haversine_jit (same contract)."""
+    dlat = lats - clat
+    dlon = lons - clon
+    a = np.sin(dlat / 2) ** 2 + np.cos(clat) * np.cos(lats) * np.sin(dlon / 2) ** 2
+    return float((2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))).max())
+
+
+if _max_haversine_aot is not None:
+    _max_haversine = _max_haversine_aot
+elif _HAVE_NUMBA:
+    _max_haversine = _max_haversine_jit
+else:
+    _max_haversine = _max_haversine_np
+
+
+def _radius_to_center(coords, center):
+    """Largest great-circle distance in meters from center to any track point."""
+    return float(_max_haversine(np.deg2rad(coords[:, 0]), np.deg2rad(coords[:, 1]),
+                                math.radians(center[0]), math.radians(center[1])))
+
+
+def _project_enu(coords, origin):
+    """Project (lat, lon) degrees to local east/north meters around origin."""
+    lat0 = np.deg2rad(origin[0])
+    lon0 = np.deg2rad(origin[1])
+    x = EARTH_RADIUS_M * np.cos(lat0) * (np.deg2rad(coords[:, 1]) - lon0)
+    y = EARTH_RADIUS_M * (np.deg2rad(coords[:, 0]) - lat0)
+    return x, y
+
+
+def _unproject_enu(x, y, origin):
+    """Invert _project_enu for a single point, returning (lat, lon) degrees."""
+    lat0 = np.deg2rad(origin[0])
+    lon0 = np.deg2rad(origin[1])
+    lat = np.rad2deg(lat0 + y / EARTH_RADIUS_M)
+    lon = np.rad2deg(lon0 + x / (EARTH_RADIUS_M * np.cos(lat0)))
+    return (lat, lon)
+
+
+def _in_circle(circle, p):
+    cx, cy, r = circle
+    return (p[0] - cx) ** 2 + (p[1] - cy) ** 2 <= (r * _MEC_EPSILON) ** 2
+
+
+def _circle_from_two(a, b):
+    cx = (a[0] + b[0]) / 2
+    cy = (a[1] + b[1]) / 2
+    r = ((a[0] - cx) ** 2 + (a[1] - cy) ** 2) ** 0.5
+    return (cx, cy, r)
+
+
+def _circle_from_three(a, b, c):
+    """Circumcircle of three points, or None if they are collinear."""
+    d = 2 * (a[0] * (b[1] - c[1]) + b[0] * (c[1] - a[1]) + c[0] * (a[1] - b[1]))
+    if d == 0:
+        return None
+    ax2 = a[0] ** 2 + a[1] ** 2
+    bx2 = b[0] ** 2 + b[1] ** 2
+    cx2 = c[0] ** 2 + c[1] ** 2
+    cx = (ax2 * (b[1] - c[1]) + bx2 * (c[1] - a[1]) + cx2 * (a[1] - b[1])) / d
+    cy = (ax2 * (c[0] - b[0]) + bx2 * (a[0] - c[0]) + cx2 * (b[0] - a[0])) / d
+    r = ((a[0] - cx) ** 2 + (a[1] - cy) ** 2) ** 0.5
+    return (cx, cy, r)
+
+
+def _cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def _mec_two_boundary(points, p, q):
+    """Smallest circle through p and q enclosing points[:len(points)]."""
+    circle = _circle_from_two(p, q)
+    left = None
+    right = None
+    for s in points:
+        if _in_circle(circle, s):
+            continue
+        side = _cross(p, q, s)
+        c = _circle_from_three(p, q, s)
+        if c is None:
+            continue
+        if side > 0 and (left is None or
+                         _cross(p, q, (c[0], c[1])) > _cross(p, q, (left[0], left[1]))):
+            left = c
+        elif side < 0 and (right is None or
+                           _cross(p, q, (c[0], c[1])) < _cross(p, q, (right[0], right[1]))):
+            right = c
+    if left is None and right is None:
+        return circle
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return left if left[2] <= right[2] else right
+
+
+def _mec_one_boundary(points, p):
+    """Smallest circle through p enclosing the given points."""
+    circle = (p[0], p[1], 0.0)
+    for i, q in enumerate(points):
+        if not _in_circle(circle, q):
+            if circle[2] == 0.0:
+                circle = _circle_from_two(p, q)
+            else:
+                circle = _mec_two_boundary(points[:i + 1], p, q)
+    return circle
+
+
+def _minimum_enclosing_circle(x, y):
+    """Welzl's randomized incremental minimum enclosing circle, expected O(N).
+
+    Takes the projected coordinates as two 1-D arrays and returns
+    (cx, cy, radius) in the same units.
+    """
+    points = list(zip(x.tolist(), y.tolist()))
+    random.shuffle(points)
+    circle = None
+    for i, p in enumerate(points):
+        if circle is None or not _in_circle(circle, p):
+            circle = _mec_one_boundary(points[:i + 1], p)
+    return circle
+
+
+def _enclosing_center(coords):
+    """Center of the minimum enclosing circle of the track, as (lat, lon).
+
+    Projects to a local ENU plane, runs Welzl on the planar points and maps
+    the center back. Compared to the bounding-box midpoint this can shrink
+    the radius by up to ~41% on diagonally elongated tracks, which cuts the
+    OSM area prettymaps has to fetch and render roughly quadratically.
+    """
+    origin = coords.mean(axis=0)
+    x, y = _project_enu(coords, origin)
+    cx, cy, _radius = _minimum_enclosing_circle(x, y)
+    return _unproject_enu(cx, cy, origin)
+
+
+@njit(cache=True)
+def _rdp_mask_jit(x, y, epsilon):
+    """Iterative Ramer-Douglas-Peucker keep-mask for a polyline.
+
+    Stack-based rather than recursive so it works under numba's nopython
+    mode; with numba missing it still runs as plain Python.
+    """
+    n = x.shape[0]
+    keep = np.zeros(n, np.bool_)
+    keep[0] = True
+    keep[n - 1] = True
+    stack = np.empty((2 * n, 2), np.int64)
+    stack[0, 0] = 0
+    stack[0, 1] = n - 1
+    top = 1
+    while top > 0:
+        top -= 1
+        i0 = stack[top, 0]
+        i1 = stack[top, 1]
+        if i1 - i0 < 2:
+            continue
+        x0 = x[i0]
+        y0 = y[i0]
+        dx = x[i1] - x0
+        dy = y[i1] - y0
+        seg = (dx * dx + dy * dy) ** 0.5
+        dmax = -1.0
+        imax = i0
+        for i in range(i0 + 1, i1):
+            if seg == 0.0:
+                d = ((x[i] - x0) ** 2 + (y[i] - y0) ** 2) ** 0.5
+            else:
+                d = abs(dx * (y[i] - y0) - dy * (x[i] - x0)) / seg
+            if d > dmax:
+                dmax = d
+                imax = i
+        if dmax > epsilon:
+            keep[imax] = True
+            stack[top, 0] = i0
+            stack[top, 1] = imax
+            top += 1
+            stack[top, 0] = imax
+            stack[top, 1] = i1
+            top += 1
+    return keep
+
+
+_rdp_mask = _rdp_mask_aot if _rdp_mask_aot is not None else _rdp_mask_jit
+
+
+def _simplify_track(coords, epsilon_m):
+    """Decimate a track with RDP at the given tolerance in meters.
+
+    A 1 Hz recording easily has tens of thousands of points; at an epsilon
+    of about one output pixel the simplified line is visually identical but
+    matplotlib strokes a far smaller Path.
+    """
+    if len(coords) < 3 or epsilon_m <= 0:
+        return coords
+    x, y = _project_enu(coords, coords.mean(axis=0))
+    return coords[_rdp_mask(x, y, epsilon_m)]
+
+
+def _enable_path_simplify():
+    """Let matplotlib drop collinear segments aggressively when stroking."""
+    import matplotlib.pyplot as plt
+    plt.rcParams['path.simplify'] = True
+    plt.rcParams['path.simplify_threshold'] = 1.0
+
+
+def _enable_osmnx_cache(cache_dir):
+    """Point osmnx at a persistent response cache so Overpass replies are reused."""
+    try:
+        import osmnx
+    except ImportError:
+        return
+    osmnx.settings.use_cache = True
+    osmnx.settings.cache_folder = os.path.join(cache_dir, 'osmnx')
+
+
+def _extract_coords_fast(gpx_file_path):
+    """Stream (lat, lon) pairs out of a GPX file into an (N, 2) float array.
+
+    Uses ElementTree.iterparse so the document is never fully materialized:
+    each <trkpt> contributes two float appends and is then cleared, which is
+    both faster and far lighter on memory than building gpxpy objects or a
+    Python list of tuples. Consecutive fixes at the same position (recorders
+    keep emitting points while standing at a traffic light) are dropped as
+    they are read; they add nothing to the bounds or the rendered line.
+    """
+    buf = array.array('d')
+    prev_lat = prev_lon = math.inf
+    for _event, elem in xml.etree.ElementTree.iterparse(gpx_file_path,
+                                                        events=('end',)):
+        # Tags carry the GPX namespace, so match on the local name.
+        if elem.tag.rpartition('}')[2] == 'trkpt':
+            lat = float(elem.get('lat'))
+            lon = float(elem.get('lon'))
+            # ~1e-6 degrees is roughly 10 cm, invisible on the output raster.
+            if abs(lat - prev_lat) > 1e-6 or abs(lon - prev_lon) > 1e-6:
+                buf.append(lat)
+                buf.append(lon)
+                prev_lat = lat
+                prev_lon = lon
+            elem.clear()
+        elif elem.tag.rpartition('}')[2] in ('trkseg', 'trk'):
+            elem.clear()
+    return np.asarray(buf, dtype=np.float64).reshape(-1, 2)
+
+
+def calculate_enclosing_circle(coordinates):
+    """Return (center, radius_m) of a circle enclosing the given track points.
+
+    Takes the (N, 2) array of (lat, lon) pairs from _extract_coords_fast so
+    the GPX file is only parsed once per run, no matter how many consumers
+    need the bounds. The center comes from the minimum enclosing circle of
+    the track and the radius is the largest great-circle distance from the
+    center to any track point, computed with a vectorized haversine.
+    """
+    if len(coordinates) == 0:
+        raise ValueError("No track points given")
+
+    coords = np.asarray(coordinates, dtype=np.float64)
+    center = _enclosing_center(coords)
+    return center, _radius_to_center(coords, center)
+
+
+class GPXMapGenerator:
+    """Generate pretty maps from GPX tracks."""
+
+    def __init__(self, figure_size=(10, 10), dpi=300, preset='default',
+                 cache_dir=None):
+        self.figure_size = figure_size
+        self.dpi = dpi
+        self.preset = preset
+        self._preset_params = None
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'run_maps')
+        self.cache_dir = cache_dir
+
+    def parse_gpx_file(self, gpx_file_path):
+        """Parse a GPX file and return the gpxpy GPX object."""
+        with open(gpx_file_path, 'r') as gpx_file:
+            return gpxpy.parse(gpx_file)
+
+    def extract_coordinates(self, gpx_file_path):
+        """Return the track's (lat, lon) pairs as an (N, 2) float array."""
+        return _extract_coords_fast(gpx_file_path)
+
+    def calculate_map_bounds(self, coordinates):
+        """Return (center, radius_m) covering the given coordinates.
+
+        Delegates to calculate_enclosing_circle, so a GPX without any
+        track points raises the same ValueError from both entry points.
+        """
+        return calculate_enclosing_circle(coordinates)
+
+    def _plot_kwargs(self):
+        """Style kwargs for prettymaps.plot, with the preset parsed only once.
+
+        prettymaps re-reads and re-parses the preset YAML on every plot
+        call; memoize the parsed parameters so a batch of files pays that
+        cost once. Falls back to passing the preset by name on prettymaps
+        versions without the preset lookup API.
+        """
+        import prettymaps
+        if self._preset_params is None:
+            try:
+                params = dict(prettymaps.preset(self.preset).params)
+                # Always framed by our own circle, whatever the preset says.
+                params.pop('radius', None)
+                # plot() re-reads the preset file per call even when every
+                # parameter is passed explicitly. preset=None skips that
+                # read on every 1.x release (1.4.x's use_preset flag just
+                # resolves to it), so it is the portable way to make the
+                # memoization stick.
+                params['preset'] = None
+                self._preset_params = params
+            except AttributeError:
+                # 0.1.x has no preset lookup API, and its plot() takes no
+                # preset kwarg either, so there is nothing to pass through.
+                self._preset_params = {}
+        return dict(self._preset_params)
+
+    def create_base_map(self, ax, center, radius):
+        """Draw the prettymaps base map for the given circle onto ax.
+
+        The OSM download is the slowest step of the whole pipeline, so
+        osmnx's response cache is pointed at a persistent directory under
+        ~/.cache/run_maps before plotting: repeat runs of the same circle
+        are served from disk, and overlapping circles reuse whatever
+        Overpass responses they share. prettymaps has no public way to
+        replot previously fetched layers across its releases, so the
+        response cache is the caching layer.
+        """
+        import prettymaps
+        os.makedirs(self.cache_dir, exist_ok=True)
+        _enable_osmnx_cache(self.cache_dir)
+        prettymaps.plot(center, ax=ax, radius=radius, **self._plot_kwargs())
+
+    def _default_epsilon(self, coords):
+        """RDP tolerance of roughly one output pixel, from the track extent."""
+        x, y = _project_enu(coords, coords.mean(axis=0))
+        span = max(x.max() - x.min(), y.max() - y.min())
+        return span / (self.figure_size[0] * self.dpi)
+
+    def overlay_track(self, ax, coordinates, color='red', linewidth=3, alpha=0.8,
+                      epsilon_m=None):
+        """Draw the track line on top of an already rendered base map."""
+        coordinates = np.asarray(coordinates, dtype=np.float64)
+        if coordinates.size == 0:
+            return
+        if epsilon_m is None:
+            epsilon_m = self._default_epsilon(coordinates)
+        coordinates = _simplify_track(coordinates, epsilon_m)
+        _enable_path_simplify()
+        line, = ax.plot(coordinates[:, 1], coordinates[:, 0], color=color,
+                        linewidth=linewidth, alpha=alpha, zorder=10)
+        # Stroke the line into a raster layer once instead of per-segment
+        # vector paths; identical PNG output, much cheaper savefig.
+        line.set_rasterized(True)
+
+    def create_track_only(self, gpx_file_path, output_file='track.png', color='red',
+                          linewidth=3):
+        """Render just the track line, without a base map."""
+        import matplotlib.pyplot as plt
+        coordinates = self.extract_coordinates(gpx_file_path)
+        if len(coordinates) >= 3:
+            coordinates = _simplify_track(coordinates,
+                                          self._default_epsilon(coordinates))
+        fig, ax = plt.subplots(figsize=self.figure_size, dpi=self.dpi)
+        # Transparent background so overlay.py can composite just the line.
+        fig.patch.set_alpha(0)
+        _enable_path_simplify()
+        line, = ax.plot(coordinates[:, 1], coordinates[:, 0], color=color,
+                        linewidth=linewidth)
+        line.set_rasterized(True)
+        ax.set_aspect('equal')
+        ax.set_axis_off()
+        plt.savefig(output_file, bbox_inches='tight', dpi=self.dpi,
+                    transparent=True)
+        plt.close(fig)
+        return output_file
+
+    def _render_map(self, fig, ax, gpx_file_path, output_file, track_color='red'):
+        """Render one GPX file onto an existing (cleared) axis and save it."""
+        coordinates = self.extract_coordinates(gpx_file_path)
+        center, radius = self.calculate_map_bounds(coordinates)
+        self.create_base_map(ax, center, radius)
+        # One output pixel is radius*2 meters over figure_size*dpi pixels.
+        epsilon_m = radius / (self.figure_size[0] * self.dpi) * 2
+        self.overlay_track(ax, coordinates, color=track_color, epsilon_m=epsilon_m)
+        fig.savefig(output_file, bbox_inches='tight')
+        return output_file
+
+    def create_map_from_gpx(self, gpx_file_path, output_file='map.png',
+                            track_color='red'):
+        """Render the base map with the track overlaid and save it to a PNG."""
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=self.figure_size, dpi=self.dpi)
+        try:
+            return self._render_map(fig, ax, gpx_file_path, output_file,
+                                    track_color=track_color)
+        finally:
+            plt.close(fig)
+
+    def process_batch(self, gpx_file_paths, output_dir='.', track_color='red'):
+        """Render many GPX files while reusing a single figure.
+
+        A 10x10 inch, 300 DPI Agg canvas is roughly 36 MB; allocating and
+        tearing one down per file adds up over a batch, so the axis is
+        cleared and reused between files instead. Outputs are named after
+        each GPX file. Returns the list of written paths.
+        """
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=self.figure_size, dpi=self.dpi)
+        outputs = []
+        try:
+            for gpx_file_path in gpx_file_paths:
+                ax.clear()
+                name = os.path.splitext(os.path.basename(gpx_file_path))[0]
+                output_file = os.path.join(output_dir, name + '.png')
+                outputs.append(self._render_map(fig, ax, gpx_file_path,
+                                                output_file,
+                                                track_color=track_color))
+        finally:
+            plt.close(fig)
+        return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create a pretty map from a GPX track.')
+    parser.add_argument('gpx_files', nargs='+', help='path(s) to GPX files')
+    parser.add_argument('-o', '--output', default=None,
+                        help='output PNG path (single input only; '
+                             'defaults to <gpx name>.png)')
+    parser.add_argument('--track-only', action='store_true',
+                        help='render only the track line, without a base map')
+    args = parser.parse_args()
+
+    generator = GPXMapGenerator()
+
+    if len(args.gpx_files) > 1 and not args.track_only:
+        generator.process_batch(args.gpx_files)
+        return
+
+    for gpx_file in args.gpx_files:
+        output = args.output
+        if output is None or len(args.gpx_files) > 1:
+            output = os.path.splitext(os.path.basename(gpx_file))[0] + '.png'
+        if args.track_only:
+            generator.create_track_only(gpx_file, output)
+        else:
+            generator.create_map_from_gpx(gpx_file, output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Composite a rendered track image onto a base map image."""
+
+import argparse
+
+import numpy as np
+from PIL import Image
+
+
+def overlay_images(map_image_path, track_image_path, output_image_path,
+                   alpha=0.8):
+    """Composite the track PNG over the base map and save the result.
+
+    The track image is expected to have a transparent background (see
+    GPXMapGenerator.create_track_only), so only the pixels the track line
+    actually covers affect the output; the base map keeps its original
+    colors everywhere else. alpha scales the track's own alpha channel.
+
+    The alpha scaling and the over-composite are fused into one integer
+    NumPy pass rather than going through Pillow channel ops, which would
+    materialize an intermediate image per step and take Pillow's float
+    path.
+    """
+    map_image = Image.open(map_image_path).convert('RGBA')
+    track_image = Image.open(track_image_path).convert('RGBA')
+
+    # Both images come out of the same figure size/dpi, so this normally
+    # never runs; it only guards against mismatched inputs.
+    if track_image.size != map_image.size:
+        track_image = track_image.resize(map_image.size, Image.LANCZOS)
+
+    map_arr = np.asarray(map_image, dtype=np.uint16)
+    track_arr = np.asarray(track_image, dtype=np.uint16)
+
+    # The base map is opaque, so "track over map" reduces to a lerp by the
+    # (scaled) track alpha, done in uint16 to stay on NumPy's integer loops.
+    a = (track_arr[:, :, 3:] * int(alpha * 256)) >> 8
+    out = np.empty_like(map_arr)
+    out[:, :, :3] = (track_arr[:, :, :3] * a
+                     + map_arr[:, :, :3] * (255 - a) + 127) // 255
+    out[:, :, 3] = 255
+    Image.fromarray(out.astype(np.uint8)).save(output_image_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Overlay a rendered track image on a base map image.')
+    parser.add_argument('map_image', help='base map PNG')
+    parser.add_argument('track_image', help='track PNG with transparent background')
+    parser.add_argument('-o', '--output', default='overlay.png',
+                        help='output PNG path')
+    parser.add_argument('--alpha', type=float, default=0.8,
+                        help='opacity of the track line (0-1)')
+    args = parser.parse_args()
+    overlay_images(args.map_image, args.track_image, args.output, alpha=args.alpha)
+
+
+if __name__ == '__main__':
+    main()